@@ -4,88 +4,164 @@ Batch process all BOTS benchmarks
 """
 
 import os
-import subprocess
+import mmap
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
-def find_openmp_files(bots_path):
-    """Find all OpenMP C files in BOTS repository"""
-    openmp_files = []
-    
-    if not os.path.exists(bots_path):
-        print(f"❌ BOTS repository not found at: {bots_path}")
-        print("   Run setup.sh first to clone the repository")
-        return []
-    
+from cfg_generator import init_worker, pool_context, process_one, render_all
+
+_PRAGMA = b'#pragma omp'
+# Bytes read before falling back to mapping the whole file
+_HEAD_SIZE = 64 * 1024
+
+def _has_openmp_pragma(file_path):
+    """Check whether a file contains an OpenMP pragma, stopping at the first hit"""
+    with open(file_path, 'rb') as f:
+        # Pragmas almost always appear near the top, so try a plain read first
+        head = f.read(_HEAD_SIZE)
+        if _PRAGMA in head:
+            return True
+        if len(head) < _HEAD_SIZE:
+            return False
+        
+        # Large file: map it and search the remainder, overlapping the head
+        # so a pragma split across the boundary is still found
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(_PRAGMA, _HEAD_SIZE - len(_PRAGMA) + 1) != -1
+
+def iter_openmp_files(bots_path):
+    """Yield (path, path relative to bots_path) for OpenMP C files in BOTS
+    repository as they are found"""
     # Search in omp-tasks directory
     omp_tasks_path = os.path.join(bots_path, "omp-tasks")
     
-    if not os.path.exists(omp_tasks_path):
-        print(f"❌ omp-tasks directory not found in: {bots_path}")
-        return []
+    # A single stat on the common path; bots_path is only checked on failure
+    if not os.path.isdir(omp_tasks_path):
+        if not os.path.exists(bots_path):
+            print(f"❌ BOTS repository not found at: {bots_path}")
+            print("   Run setup.sh first to clone the repository")
+        else:
+            print(f"❌ omp-tasks directory not found in: {bots_path}")
+        return
     
-    for root, dirs, files in os.walk(omp_tasks_path):
-        for file in files:
-            if file.endswith('.c'):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        if '#pragma omp' in content:
-                            openmp_files.append(file_path)
-                except Exception as e:
-                    print(f"⚠️  Could not read {file_path}: {e}")
-                    continue
+    # Every path found starts with bots_path plus a separator
+    prefix_len = len(os.path.join(bots_path, ''))
     
-    return openmp_files
+    # Iterative depth-first walk; DirEntry caches the file type, so
+    # directories and non-C files are told apart without extra stat calls
+    stack = [omp_tasks_path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.c'):
+                    file_path = entry.path
+                    try:
+                        if _has_openmp_pragma(file_path):
+                            yield file_path, file_path[prefix_len:]
+                    except Exception as e:
+                        print(f"⚠️  Could not read {file_path}: {e}")
+                        continue
+
+def find_openmp_files(bots_path):
+    """Find all OpenMP C files in BOTS repository"""
+    return list(iter_openmp_files(bots_path))
 
 def main():
     bots_path = "../bots"
     output_path = "../output"
     
     print("🔍 Searching for OpenMP files in BOTS repository...")
-    openmp_files = find_openmp_files(bots_path)
-    
-    if not openmp_files:
-        print("❌ No OpenMP files found!")
-        print("   Make sure the BOTS repository is cloned correctly")
-        return 1
-    
-    print(f"✅ Found {len(openmp_files)} OpenMP files:")
-    for i, file in enumerate(openmp_files, 1):
-        rel_path = os.path.relpath(file, bots_path)
-        print(f"   {i:2d}. {rel_path}")
-    
-    print(f"\n🚀 Processing all files...")
+    print(f"🚀 Processing files as they are found...")
     
+    found_count = 0
     success_count = 0
     fail_count = 0
+    # DOT file -> benchmark name, rendered to PNG after all files are done
+    dot_files = {}
     
-    # Process each file
-    for i, file_path in enumerate(openmp_files, 1):
-        rel_path = os.path.relpath(file_path, bots_path)
-        print(f"\n[{i}/{len(openmp_files)}] Processing: {rel_path}")
-        
+    def collect(future, file_path, rel_path):
+        nonlocal success_count, fail_count
         try:
-            cmd = [
-                'python3', 'cfg_generator.py',
-                '--input', file_path,
-                '--output', output_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            code, _, error = future.result()
+            ok = code == 0
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for exceeding its memory limit);
+            # every file the pool still had in flight counts as failed
+            ok, error = False, "worker process terminated abruptly"
+        print(f"\n[{success_count + fail_count + 1}] Processed: {rel_path}")
+        
+        if ok:
             print(f"✅ Success: {rel_path}")
             success_count += 1
-            
-        except subprocess.CalledProcessError as e:
+            benchmark_name = Path(file_path).stem
+            dot_files[os.path.join(output_path, f"{benchmark_name}_cfg.dot")] = benchmark_name
+        else:
             print(f"❌ Failed: {rel_path}")
-            print(f"   Error: {e}")
-            if e.stderr:
-                print(f"   Details: {e.stderr.strip()}")
-            fail_count += 1
-        except Exception as e:
-            print(f"❌ Unexpected error for {rel_path}: {e}")
+            if error:
+                print(f"   Error: {error}")
             fail_count += 1
     
+    # Submit files to the worker pool while the tree is still being walked,
+    # so discovery overlaps with CFG generation
+    max_workers = os.cpu_count() or 1
+    max_pending = max_workers * 4
+    
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context(),
+                                   initializer=init_worker)
+    
+    executor = new_pool()
+    try:
+        pending = {}
+        # Benchmark name -> future of the last file submitted with it
+        by_name = {}
+        for file_path, rel_path in iter_openmp_files(bots_path):
+            found_count += 1
+            
+            # Files sharing a stem (e.g. alignment_for/alignment.c and
+            # alignment_single/alignment.c) write the same output files, so
+            # run them one after another; the later one wins, as it did when
+            # files were processed serially
+            benchmark_name = Path(file_path).stem
+            previous = by_name.get(benchmark_name)
+            if previous is not None:
+                wait([previous])
+            
+            # Per-file progress output is discarded, as it was for the subprocess
+            task = (file_path, output_path, 8, 'x86_64', True, 'discard')
+            try:
+                future = executor.submit(process_one, task)
+            except BrokenProcessPool:
+                # Replace a crashed pool so the remaining files still run
+                executor.shutdown(wait=False)
+                executor = new_pool()
+                future = executor.submit(process_one, task)
+            pending[future] = file_path, rel_path
+            by_name[benchmark_name] = future
+            
+            # Keep discovery from running too far ahead of the workers
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future, *pending.pop(future))
+        
+        for future in as_completed(pending):
+            collect(future, *pending[future])
+    finally:
+        executor.shutdown()
+    
+    if not found_count:
+        print("❌ No OpenMP files found!")
+        print("   Make sure the BOTS repository is cloned correctly")
+        return 1
+    
+    # Render every PNG with a single dot invocation, falling back to the
+    # per-file methods when the dot command is not available
+    render_all(dot_files, output_path, quiet=True)
+    
     print(f"\n📊 Batch processing completed!")
     print(f"   ✅ Successful: {success_count}")
     print(f"   ❌ Failed: {fail_count}")
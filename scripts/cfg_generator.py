@@ -4,134 +4,41 @@ LLM-Based CFG Generator for OpenMP Code - HPC Version with Fixed PNG Generation
 Optimized for HPC environments without sudo access
 """
 
+import io
 import os
 import re
+import sys
+import glob
 import json
+import shutil
+import hashlib
 import argparse
-from typing import Dict, List
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext, redirect_stdout
+from itertools import islice
+from typing import Dict, List, Optional, Union
 from pathlib import Path
 
-class OpenMPCFGGenerator:
-    def __init__(self, api_key=None, model="gpt-4"):
-        self.api_key = api_key
-        self.model = model
-        
-    def extract_openmp_constructs(self, source_code: str) -> Dict:
-        """Extract OpenMP constructs from source code"""
-        constructs = {
-            'parallel_regions': [],
-            'tasks': [],
-            'for_loops': [],
-            'single_regions': [],
-            'sync_points': []
-        }
-        
-        lines = source_code.split('\n')
-        for i, line in enumerate(lines):
-            line_stripped = line.strip()
-            
-            if '#pragma omp' in line_stripped:
-                if 'parallel' in line_stripped and 'for' not in line_stripped:
-                    constructs['parallel_regions'].append({
-                        'line': i + 1,
-                        'pragma': line_stripped,
-                        'type': 'parallel'
-                    })
-                elif 'task' in line_stripped and 'taskwait' not in line_stripped:
-                    constructs['tasks'].append({
-                        'line': i + 1,
-                        'pragma': line_stripped,
-                        'type': 'task',
-                        'untied': 'untied' in line_stripped,
-                        'firstprivate': 'firstprivate' in line_stripped,
-                        'shared': 'shared' in line_stripped
-                    })
-                elif 'for' in line_stripped:
-                    constructs['for_loops'].append({
-                        'line': i + 1,
-                        'pragma': line_stripped,
-                        'type': 'for',
-                        'nowait': 'nowait' in line_stripped,
-                        'private': 'private' in line_stripped
-                    })
-                elif 'single' in line_stripped:
-                    constructs['single_regions'].append({
-                        'line': i + 1,
-                        'pragma': line_stripped,
-                        'type': 'single'
-                    })
-                elif any(sync in line_stripped for sync in ['barrier', 'taskwait', 'critical']):
-                    constructs['sync_points'].append({
-                        'line': i + 1,
-                        'pragma': line_stripped,
-                        'type': 'synchronization'
-                    })
-                    
-        return constructs
-    
-    def generate_cfg_prompt(self, source_code: str, hardware_specs: Dict) -> str:
-        """Generate LLM prompt for CFG creation"""
-        constructs = self.extract_openmp_constructs(source_code)
-        
-        prompt = f"""
-You are an expert in parallel programming and control flow analysis. 
-Generate a Control Flow Graph (CFG) for the following OpenMP C code.
+# orjson is an optional, faster JSON serializer
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-DETECTED OPENMP CONSTRUCTS:
-{json.dumps(constructs, indent=2)}
+# Matches "#pragma omp ..." anywhere in a line; group 1 is the directive
+# keyword and group 2 the rest of the line (clauses and any combined directive)
+_PRAGMA_RE = re.compile(r'#pragma[ \t]+omp[ \t]+(\w+)([^\n]*)')
+# Clause options recorded for task and for constructs
+_CLAUSE_RE = re.compile(r'untied|firstprivate|shared|nowait|private')
+# Slice size for the case-insensitive SparseLU search
+_SPARSELU_CHUNK = 1 << 20
+# DOT node declarations (id, label, fillcolor) for the matplotlib fallback
+_NODE_RE = re.compile(r'(\w+)\s*\[label="([^"]+)"[^\]]*fillcolor=(\w+)[^\]]*\]')
 
-SOURCE CODE:
-```c
-{source_code}
-```
-
-HARDWARE SPECIFICATIONS:
-- Cores: {hardware_specs.get('cores', 8)}
-- Architecture: {hardware_specs.get('arch', 'x86_64')}
-- Memory: {hardware_specs.get('memory', '16GB')}
-
-REQUIREMENTS:
-1. Create nodes for each basic block
-2. Show control flow edges between blocks
-3. Annotate parallel regions and task creation points
-4. Mark synchronization points (barriers, taskwait)
-5. Distinguish between tied and untied tasks
-6. Show loop structures and iterations
-
-OUTPUT FORMAT:
-Provide the CFG in Graphviz DOT notation with:
-- Nodes representing basic blocks (BB_X format)
-- Edges showing control flow transitions
-- Color coding: lightblue for parallel regions, red for tasks, lightgreen for sync points, yellow for parallel for loops
-- Labels indicating OpenMP construct types
-- Clear entry and exit points
-
-Generate the complete DOT graph now:
-"""
-        return prompt
-    
-    def simulate_llm_response(self, source_code: str, constructs: Dict) -> str:
-        """Generate realistic CFG based on detected constructs"""
-        
-        # Analyze the code structure
-        has_parallel = len(constructs['parallel_regions']) > 0
-        has_tasks = len(constructs['tasks']) > 0
-        has_for_loops = len(constructs['for_loops']) > 0
-        has_single = len(constructs['single_regions']) > 0
-        
-        # Generate appropriate CFG based on detected patterns
-        if 'sparselu' in source_code.lower() or ('lu0' in source_code and 'fwd' in source_code):
-            return self._generate_sparselu_cfg()
-        elif has_parallel and has_tasks and has_for_loops:
-            return self._generate_task_parallel_cfg(constructs)
-        elif has_parallel and has_for_loops:
-            return self._generate_parallel_for_cfg(constructs)
-        else:
-            return self._generate_basic_cfg(constructs)
-    
-    def _generate_sparselu_cfg(self) -> str:
-        """Generate SparseLU-specific CFG"""
-        return '''
+# SparseLU-specific CFG
+_SPARSELU_DOT = '''
 digraph "SparseLU_CFG" {
     rankdir=TB;
     node [shape=box, style=filled];
@@ -192,10 +99,9 @@ digraph "SparseLU_CFG" {
     BB_bmod_task -> BB_bmod_task [label="task instances", style=dashed, color=red];
 }
 '''
-    
-    def _generate_task_parallel_cfg(self, constructs: Dict) -> str:
-        """Generate CFG for task-parallel code"""
-        return '''
+
+# CFG for task-parallel code
+_TASK_PARALLEL_DOT = '''
 digraph "TaskParallel_CFG" {
     rankdir=TB;
     node [shape=box, style=filled];
@@ -220,10 +126,9 @@ digraph "TaskParallel_CFG" {
     BB_task_create -> BB_task_create [label="multiple tasks", style=dashed];
 }
 '''
-    
-    def _generate_parallel_for_cfg(self, constructs: Dict) -> str:
-        """Generate CFG for parallel for loops"""
-        return '''
+
+# CFG for parallel for loops
+_PARALLEL_FOR_DOT = '''
 digraph "ParallelFor_CFG" {
     rankdir=TB;
     node [shape=box, style=filled];
@@ -245,10 +150,9 @@ digraph "ParallelFor_CFG" {
     BB_parallel_end -> BB_exit;
 }
 '''
-    
-    def _generate_basic_cfg(self, constructs: Dict) -> str:
-        """Generate basic CFG"""
-        return '''
+
+# Basic CFG
+_BASIC_DOT = '''
 digraph "Basic_CFG" {
     rankdir=TB;
     node [shape=box, style=filled];
@@ -261,6 +165,269 @@ digraph "Basic_CFG" {
     BB_sequential -> BB_exit;
 }
 '''
+
+# Simulated LLM responses, keyed by the kind returned from _classify_cfg()
+_CFG_TEMPLATES = {
+    'sparselu': _SPARSELU_DOT,
+    'task_parallel': _TASK_PARALLEL_DOT,
+    'parallel_for': _PARALLEL_FOR_DOT,
+    'basic': _BASIC_DOT,
+}
+# The templates are pure ASCII; encode them once for save_cfg
+_ENCODED_TEMPLATES = {dot: dot.encode('ascii') for dot in _CFG_TEMPLATES.values()}
+
+# Accepted values for save_png/save_cfg png_backend
+PNG_BACKENDS = ('auto', 'none', 'graphviz', 'dot', 'matplotlib')
+
+# DOT content digest -> (rendered PNG path, its mtime), so a graph that was
+# already rendered is copied instead of rendered again
+_PNG_CACHE: Dict[str, tuple] = {}
+_PNG_CACHE_SIZE = 1024
+
+# Construct kinds, as keys of extract_openmp_constructs(), and their 'type'
+_CONSTRUCT_TYPES = {
+    'parallel_regions': 'parallel',
+    'tasks': 'task',
+    'for_loops': 'for',
+    'single_regions': 'single',
+    'sync_points': 'synchronization',
+}
+
+class ConstructCounts:
+    """Number of OpenMP constructs of each kind found in a source file"""
+    __slots__ = ('parallel_regions', 'tasks', 'for_loops', 'single_regions', 'sync_points')
+    
+    def __init__(self, parallel_regions: int = 0, tasks: int = 0, for_loops: int = 0,
+                 single_regions: int = 0, sync_points: int = 0):
+        self.parallel_regions = parallel_regions
+        self.tasks = tasks
+        self.for_loops = for_loops
+        self.single_regions = single_regions
+        self.sync_points = sync_points
+    
+    @classmethod
+    def from_constructs(cls, constructs: Dict) -> 'ConstructCounts':
+        """Build counts from the output of extract_openmp_constructs"""
+        return cls(**{kind: len(found) for kind, found in constructs.items()})
+
+# OpenMP directive name -> construct kind
+_DISPATCH = {
+    'parallel': 'parallel_regions',
+    'task': 'tasks',
+    'taskloop': 'tasks',
+    'taskgroup': 'tasks',
+    'for': 'for_loops',
+    'single': 'single_regions',
+    'barrier': 'sync_points',
+    'taskwait': 'sync_points',
+    'critical': 'sync_points',
+}
+# Further directive names of a combined construct, such as "target teams
+# distribute parallel for"; they end where the first clause starts
+_COMBINED_RE = re.compile(r'(?:[ \t]+(?:parallel|for|simd|taskloop|task|master|masked|'
+                          r'teams|distribute|target|loop|sections)\b)*')
+# Kind recorded when a combined construct names several: "parallel for"
+# is a for loop, "parallel master taskloop" a parallel region
+_KIND_PRECEDENCE = ('for_loops', 'parallel_regions', 'tasks', 'single_regions', 'sync_points')
+
+def _construct_kind(directive: str, clauses: str) -> Optional[str]:
+    """Classify an OpenMP directive into a construct kind from its
+    directive names"""
+    combined = _COMBINED_RE.match(clauses).group()
+    if not combined:
+        return _DISPATCH.get(directive)
+    
+    kinds = {_DISPATCH.get(name) for name in combined.split()}
+    kinds.add(_DISPATCH.get(directive))
+    for kind in _KIND_PRECEDENCE:
+        if kind in kinds:
+            return kind
+    return None
+
+def _mentions_sparselu(source_code: str) -> bool:
+    """Case-insensitive search for "sparselu" that lowercases bounded
+    slices of the source instead of copying the whole file"""
+    overlap = len('sparselu') - 1
+    for start in range(0, len(source_code), _SPARSELU_CHUNK):
+        if 'sparselu' in source_code[start:start + _SPARSELU_CHUNK + overlap].lower():
+            return True
+    return False
+
+def _dot_digest(data: bytes) -> str:
+    """Key for _PNG_CACHE"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _copy_cached_png(digest: str, png_file: str) -> bool:
+    """Copy the PNG already rendered for this DOT content to png_file;
+    returns False if there is none or it has been overwritten since"""
+    entry = _PNG_CACHE.get(digest)
+    if entry is None:
+        return False
+    cached_file, mtime = entry
+    try:
+        if os.stat(cached_file).st_mtime_ns != mtime:
+            del _PNG_CACHE[digest]
+            return False
+        if cached_file != png_file:
+            shutil.copyfile(cached_file, png_file)
+    except OSError:
+        _PNG_CACHE.pop(digest, None)
+        return False
+    return True
+
+def _remember_png(digest: str, png_file: str):
+    """Record a freshly rendered PNG in _PNG_CACHE, evicting the oldest entry
+    when full"""
+    try:
+        mtime = os.stat(png_file).st_mtime_ns
+    except OSError:
+        return
+    if digest not in _PNG_CACHE and len(_PNG_CACHE) >= _PNG_CACHE_SIZE:
+        del _PNG_CACHE[next(iter(_PNG_CACHE))]
+    _PNG_CACHE[digest] = (png_file, mtime)
+
+def _dumps_constructs(constructs: Dict, compact: bool = False) -> str:
+    """Serialize detected constructs as JSON, pretty-printed for the console
+    or with ``compact=True`` as small as possible for an LLM prompt"""
+    if orjson is not None:
+        if compact:
+            return orjson.dumps(constructs).decode()
+        return orjson.dumps(constructs, option=orjson.OPT_INDENT_2).decode()
+    if compact:
+        return json.dumps(constructs, separators=(',', ':'), ensure_ascii=False)
+    return json.dumps(constructs, indent=2)
+
+class OpenMPCFGGenerator:
+    __slots__ = ('api_key', 'model')
+    
+    def __init__(self, api_key=None, model="gpt-4"):
+        self.api_key = api_key
+        self.model = model
+        
+    def extract_openmp_constructs(self, source_code: str) -> Dict:
+        """Extract OpenMP constructs from source code"""
+        constructs = {
+            'parallel_regions': [],
+            'tasks': [],
+            'for_loops': [],
+            'single_regions': [],
+            'sync_points': []
+        }
+        
+        # Matches arrive in order, so line numbers are kept by counting only
+        # the newlines since the previous match; no per-line objects are made
+        line = 1
+        line_start = 0
+        for match in _PRAGMA_RE.finditer(source_code):
+            kind = _construct_kind(match.group(1), match.group(2))
+            if kind is None:
+                continue
+            
+            line += source_code.count('\n', line_start, match.start())
+            line_start = match.start()
+            pragma = match.group(0).strip()
+            clauses = match.group(2)
+            
+            construct = {
+                'line': line,
+                'pragma': pragma,
+                'type': _CONSTRUCT_TYPES[kind]
+            }
+            if kind == 'tasks':
+                options = set(_CLAUSE_RE.findall(clauses))
+                construct['untied'] = 'untied' in options
+                construct['firstprivate'] = 'firstprivate' in options
+                construct['shared'] = 'shared' in options
+            elif kind == 'for_loops':
+                options = set(_CLAUSE_RE.findall(clauses))
+                construct['nowait'] = 'nowait' in options
+                # "firstprivate" matches as its own token but is still private
+                construct['private'] = 'private' in options or 'firstprivate' in options
+            constructs[kind].append(construct)
+            
+        return constructs
+    
+    def count_openmp_constructs(self, source_code: str) -> 'ConstructCounts':
+        """Count OpenMP constructs without recording per-construct details"""
+        counts = ConstructCounts()
+        for match in _PRAGMA_RE.finditer(source_code):
+            kind = _construct_kind(match.group(1), match.group(2))
+            if kind is not None:
+                setattr(counts, kind, getattr(counts, kind) + 1)
+        return counts
+    
+    def generate_cfg_prompt(self, source_code: str, hardware_specs: Dict,
+                            constructs: Dict = None) -> str:
+        """Generate LLM prompt for CFG creation
+
+        Pass ``constructs`` when they have already been extracted to avoid
+        scanning the source a second time.
+        """
+        if constructs is None:
+            constructs = self.extract_openmp_constructs(source_code)
+        
+        prompt = f"""
+You are an expert in parallel programming and control flow analysis. 
+Generate a Control Flow Graph (CFG) for the following OpenMP C code.
+
+DETECTED OPENMP CONSTRUCTS:
+{_dumps_constructs(constructs, compact=True)}
+
+SOURCE CODE:
+```c
+{source_code}
+```
+
+HARDWARE SPECIFICATIONS:
+- Cores: {hardware_specs.get('cores', 8)}
+- Architecture: {hardware_specs.get('arch', 'x86_64')}
+- Memory: {hardware_specs.get('memory', '16GB')}
+
+REQUIREMENTS:
+1. Create nodes for each basic block
+2. Show control flow edges between blocks
+3. Annotate parallel regions and task creation points
+4. Mark synchronization points (barriers, taskwait)
+5. Distinguish between tied and untied tasks
+6. Show loop structures and iterations
+
+OUTPUT FORMAT:
+Provide the CFG in Graphviz DOT notation with:
+- Nodes representing basic blocks (BB_X format)
+- Edges showing control flow transitions
+- Color coding: lightblue for parallel regions, red for tasks, lightgreen for sync points, yellow for parallel for loops
+- Labels indicating OpenMP construct types
+- Clear entry and exit points
+
+Generate the complete DOT graph now:
+"""
+        return prompt
+    
+    def simulate_llm_response(self, source_code: str,
+                              constructs: Union[Dict, ConstructCounts]) -> str:
+        """Generate realistic CFG based on detected constructs"""
+        return _CFG_TEMPLATES[self._classify_cfg(source_code, constructs)]
+    
+    def _classify_cfg(self, source_code: str,
+                      constructs: Union[Dict, ConstructCounts]) -> str:
+        """Pick the CFG template kind that matches the detected constructs"""
+        if isinstance(constructs, dict):
+            constructs = ConstructCounts.from_constructs(constructs)
+        
+        # Analyze the code structure
+        has_parallel = constructs.parallel_regions > 0
+        has_tasks = constructs.tasks > 0
+        has_for_loops = constructs.for_loops > 0
+        
+        # Select the appropriate CFG based on detected patterns
+        if _mentions_sparselu(source_code) or ('lu0' in source_code and 'fwd' in source_code):
+            return 'sparselu'
+        elif has_parallel and has_tasks and has_for_loops:
+            return 'task_parallel'
+        elif has_parallel and has_for_loops:
+            return 'parallel_for'
+        else:
+            return 'basic'
     
     def validate_cfg(self, dot_graph: str, original_code: str) -> Dict:
         """Validate the generated CFG"""
@@ -273,20 +440,24 @@ digraph "Basic_CFG" {
             'has_edges': False
         }
         
-        # Check for entry/exit points
-        if any(entry in dot_graph for entry in ['Entry', 'BB_entry', 'entry']) and any(exit in dot_graph for exit in ['Exit', 'BB_exit', 'exit']):
+        # Lowercase once for all of the case-insensitive checks below
+        lowered = dot_graph.lower()
+        
+        # Check for entry/exit points ("BB_entry"/"BB_exit" contain the
+        # lowercase names, so they need no check of their own)
+        if ('Entry' in dot_graph or 'entry' in dot_graph) and ('Exit' in dot_graph or 'exit' in dot_graph):
             validation_results['has_entry_exit'] = True
             
         # Check for parallel regions
-        if 'parallel' in dot_graph.lower():
+        if 'parallel' in lowered:
             validation_results['parallel_regions_detected'] = True
             
         # Check for tasks
-        if 'task' in dot_graph.lower():
+        if 'task' in lowered:
             validation_results['tasks_detected'] = True
             
         # Check for synchronization points
-        if any(sync in dot_graph.lower() for sync in ['barrier', 'single', 'sync']):
+        if 'barrier' in lowered or 'single' in lowered or 'sync' in lowered:
             validation_results['sync_points_detected'] = True
             
         # Check DOT syntax
@@ -299,26 +470,60 @@ digraph "Basic_CFG" {
             
         return validation_results
     
-    def save_cfg(self, dot_graph: str, output_path: str, benchmark_name: str):
-        """Save the generated CFG to files - HPC Optimized Version"""
+    def save_cfg(self, dot_graph: str, output_path: str, benchmark_name: str,
+                 png_backend: str = 'auto'):
+        """Save the generated CFG to files - HPC Optimized Version
+
+        ``png_backend`` selects how the PNG is rendered (see ``save_png``);
+        with ``'none'`` only the DOT file is written, e.g. to render many
+        files at once later with ``render_pngs``.
+        """
         os.makedirs(output_path, exist_ok=True)
         
         # Save DOT file (always works)
-        dot_file = os.path.join(output_path, f"{benchmark_name}_cfg.dot")
-        with open(dot_file, 'w') as f:
-            f.write(dot_graph)
+        dot_file = os.path.join(output_path, f"{benchmark_name}_cfg") + ".dot"
+        data = _ENCODED_TEMPLATES.get(dot_graph) or dot_graph.encode('utf-8')
+        fd = os.open(dot_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # os.write may write less than asked for; finish the rest
+            written = os.write(fd, data)
+            while written < len(data):
+                written += os.write(fd, data[written:])
+        finally:
+            os.close(fd)
         print(f"✅ DOT file saved: {dot_file}")
         
+        if png_backend != 'none':
+            self.save_png(dot_graph, dot_file, output_path, benchmark_name, png_backend)
+        
+        return dot_file
+    
+    def save_png(self, dot_graph: str, dot_file: str, output_path: str,
+                 benchmark_name: str, backend: str = 'auto') -> bool:
+        """Render a saved CFG to PNG, falling back to a text visualization
+
+        ``backend='auto'`` tries each method in turn; naming a single backend
+        runs only that one, so the others are never imported.
+        """
         # Try multiple methods for PNG generation
         png_generated = False
-        png_file = os.path.join(output_path, f"{benchmark_name}_cfg.png")
+        # All output files share this path, differing only in extension
+        png_base = os.path.join(output_path, f"{benchmark_name}_cfg")
+        png_file = png_base + ".png"
+        
+        # Identical graphs (e.g. the same template) are rendered only once.
+        # Only graphviz/dot renders are cached: they depend on the DOT text
+        # alone, while matplotlib also draws the benchmark name in the title
+        digest = _dot_digest(_ENCODED_TEMPLATES.get(dot_graph) or dot_graph.encode('utf-8'))
+        if backend in ('auto', 'graphviz', 'dot') and _copy_cached_png(digest, png_file):
+            print(f"✅ PNG copied from an identical CFG: {png_file}")
+            return True
         
         # Method 1: Try Python graphviz package
-        if not png_generated:
+        if not png_generated and backend in ('auto', 'graphviz'):
             try:
                 import graphviz
                 source = graphviz.Source(dot_graph)
-                png_base = os.path.join(output_path, f"{benchmark_name}_cfg")
                 source.render(png_base, format='png', cleanup=True)
                 print(f"✅ PNG generated using Python graphviz: {png_base}.png")
                 png_generated = True
@@ -328,29 +533,33 @@ digraph "Basic_CFG" {
                 print(f"ℹ️  Python graphviz failed: {e}")
         
         # Method 2: Try system dot command
-        if not png_generated:
+        if not png_generated and backend in ('auto', 'dot'):
             try:
                 import subprocess
-                result = subprocess.run(['dot', '-Tpng', dot_file, '-o', png_file], 
-                                      capture_output=True, text=True, check=True, timeout=30)
+                # Only the exit status matters; stderr is kept for the error message
+                subprocess.run(['dot', '-Tpng', dot_file, '-o', png_file],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               check=True, timeout=30)
                 print(f"✅ PNG generated using system dot: {png_file}")
                 png_generated = True
             except subprocess.TimeoutExpired:
                 print("ℹ️  System dot command timed out")
             except subprocess.CalledProcessError as e:
-                print(f"ℹ️  System dot command failed: {e.stderr}")
+                print(f"ℹ️  System dot command failed: {e.stderr.decode('utf-8', 'replace')}")
             except FileNotFoundError:
                 print("ℹ️  System dot command not found")
             except Exception as e:
                 print(f"ℹ️  System dot failed: {e}")
         
+        if png_generated:
+            _remember_png(digest, png_file)
+        
         # Method 3: Try alternative PNG generation using matplotlib
-        if not png_generated:
+        if not png_generated and backend in ('auto', 'matplotlib'):
             try:
                 import matplotlib.pyplot as plt
                 import matplotlib.patches as patches
                 from matplotlib.patches import FancyBboxPatch
-                import re
                 
                 # Simple visualization using matplotlib
                 fig, ax = plt.subplots(1, 1, figsize=(12, 8))
@@ -358,9 +567,8 @@ digraph "Basic_CFG" {
                 ax.set_ylim(0, 10)
                 ax.set_aspect('equal')
                 
-                # Extract nodes from DOT graph
-                node_pattern = r'(\w+)\s*\[label="([^"]+)"[^\]]*fillcolor=(\w+)[^\]]*\]'
-                nodes = re.findall(node_pattern, dot_graph)
+                # Extract nodes from DOT graph, stopping after the 10 that are drawn
+                nodes = islice(_NODE_RE.finditer(dot_graph), 10)
                 
                 # Color mapping
                 color_map = {
@@ -374,7 +582,8 @@ digraph "Basic_CFG" {
                 
                 # Draw nodes
                 y_pos = 9
-                for i, (node_id, label, color) in enumerate(nodes[:10]):  # Limit to 10 nodes
+                for i, match in enumerate(nodes):
+                    node_id, label, color = match.groups()
                     clean_label = label.replace('\\n', '\n')
                     box_color = color_map.get(color, '#FFFFFF')
                     
@@ -409,7 +618,7 @@ digraph "Basic_CFG" {
         # Method 4: Create a simple text-based visualization
         if not png_generated:
             try:
-                txt_file = os.path.join(output_path, f"{benchmark_name}_cfg.txt")
+                txt_file = png_base + ".txt"
                 with open(txt_file, 'w') as f:
                     f.write(f"Control Flow Graph for {benchmark_name}\n")
                     f.write("=" * 50 + "\n\n")
@@ -431,85 +640,277 @@ digraph "Basic_CFG" {
             print("ℹ️  You can convert DOT to PNG later using online tools or local graphviz")
             print(f"ℹ️  Online converter: https://dreampuf.github.io/GraphvizOnline/")
         
-        return dot_file
+        return png_generated
 
-def main():
-    parser = argparse.ArgumentParser(description='Generate CFG from OpenMP code (HPC Version)')
-    parser.add_argument('--input', '-i', required=True, help='Input C file path')
-    parser.add_argument('--output', '-o', default='../output', help='Output directory')
-    parser.add_argument('--cores', type=int, default=8, help='Number of cores')
-    parser.add_argument('--arch', default='x86_64', help='Target architecture')
-    parser.add_argument('--api-key', help='OpenAI API key (optional)')
+def render_pngs(dot_files: List[str], batch_size: int = 500) -> bool:
+    """Render many DOT files to PNG with one system dot process per batch
+
+    Each ``NAME.dot`` is rendered to ``NAME.png`` next to it; files with
+    identical contents are rendered once and the PNG copied. Returns False
+    if the dot command is unavailable or fails.
+    """
+    import subprocess
+    
+    # DOT content digest -> first file with that content, still to render
+    to_render = {}
+    # (PNG file, digest) for files whose content is already being rendered
+    copies = []
+    for dot_file in dot_files:
+        with open(dot_file, 'rb') as f:
+            digest = _dot_digest(f.read())
+        png_file = f"{os.path.splitext(dot_file)[0]}.png"
+        if digest in to_render:
+            copies.append((png_file, digest))
+        elif not _copy_cached_png(digest, png_file):
+            to_render[digest] = dot_file
+    
+    # Bounded batches keep the command line well under ARG_MAX
+    pending = list(to_render.items())
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        try:
+            # Same 30s budget as a single save_png render, plus a little per file
+            subprocess.run(['dot', '-Tpng', '-O', *(dot_file for _, dot_file in batch)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True,
+                           timeout=30 + 5 * len(batch))
+        except subprocess.TimeoutExpired:
+            print("ℹ️  System dot command timed out")
+            return False
+        except subprocess.CalledProcessError as e:
+            details = e.stderr.decode('utf-8', 'replace').strip() if e.stderr else ''
+            print(f"ℹ️  System dot command failed: {details}")
+            return False
+        except FileNotFoundError:
+            print("ℹ️  System dot command not found")
+            return False
+        
+        # dot -O writes NAME.dot.png; rename to the save_png naming
+        for digest, dot_file in batch:
+            png_file = f"{os.path.splitext(dot_file)[0]}.png"
+            os.replace(f"{dot_file}.png", png_file)
+            _remember_png(digest, png_file)
     
-    args = parser.parse_args()
+    for png_file, digest in copies:
+        shutil.copyfile(f"{os.path.splitext(to_render[digest])[0]}.png", png_file)
+    
+    return True
+
+def render_all(dot_files: Dict[str, str], output_path: str, backend: str = 'auto',
+               quiet: bool = False):
+    """Render the PNGs for many saved DOT files, given as DOT file -> benchmark name
+
+    One dot process renders every file; other backends, or auto when dot is
+    unavailable, fall back to ``save_png`` file by file, whose messages are
+    discarded when ``quiet``.
+    """
+    if not dot_files or backend == 'none':
+        return
+    
+    print(f"\n🖼️  Rendering {len(dot_files)} PNG files...")
+    rendered = backend in ('auto', 'dot') and render_pngs(list(dot_files))
+    if rendered or backend == 'dot':
+        return
+    
+    generator = OpenMPCFGGenerator()
+    with (open(os.devnull, 'w') if quiet else nullcontext(sys.stdout)) as sink:
+        with redirect_stdout(sink):
+            for dot_file, benchmark_name in dot_files.items():
+                with open(dot_file, 'r', encoding='utf-8') as f:
+                    dot_graph = f.read()
+                generator.save_png(dot_graph, dot_file, output_path, benchmark_name, backend)
+
+def process_file(input_path: str, output_path: str, cores: int = 8,
+                 arch: str = 'x86_64', api_key: str = None,
+                 generator: OpenMPCFGGenerator = None, png_backend: str = 'auto',
+                 quiet: bool = False) -> int:
+    """Generate, validate and save the CFG for a single OpenMP source file
+
+    Pass an existing ``generator`` to reuse it across many files, and
+    ``png_backend='none'`` to write only the DOT file. ``quiet=True`` skips
+    the detailed construct listing and the validation results.
+    """
+    # Validate input file; one stat covers both existence and emptiness
+    try:
+        file_size = os.stat(input_path).st_size
+    except OSError:
+        print(f"❌ Error: Input file '{input_path}' not found")
+        return 1
     
-    # Validate input file
-    if not os.path.exists(args.input):
-        print(f"❌ Error: Input file '{args.input}' not found")
+    if file_size == 0:
+        print(f"❌ Error: Input file '{input_path}' is empty")
         return 1
     
     try:
-        # Read input file
-        with open(args.input, 'r', encoding='utf-8') as f:
+        # Read input file, with a buffer sized to the file (8KB to 1MB)
+        buffering = min(max(file_size, 8192), 1 << 20)
+        with open(input_path, 'r', encoding='utf-8', buffering=buffering) as f:
             source_code = f.read()
         
-        if not source_code.strip():
-            print(f"❌ Error: Input file '{args.input}' is empty")
+        if source_code.isspace():
+            print(f"❌ Error: Input file '{input_path}' is empty")
             return 1
             
     except Exception as e:
-        print(f"❌ Error reading file '{args.input}': {e}")
+        print(f"❌ Error reading file '{input_path}': {e}")
         return 1
     
-    # Setup hardware specs
-    hardware_specs = {
-        'cores': args.cores,
-        'arch': args.arch,
-        'memory': '16GB'
-    }
-    
     # Initialize generator
-    generator = OpenMPCFGGenerator(api_key=args.api_key)
+    if generator is None:
+        generator = OpenMPCFGGenerator(api_key=api_key)
     
-    print(f"📁 Processing file: {args.input}")
-    print(f"🎯 Target hardware: {args.cores} cores, {args.arch}")
+    print(f"📁 Processing file: {input_path}")
+    print(f"🎯 Target hardware: {cores} cores, {arch}")
     
-    # Extract constructs
-    constructs = generator.extract_openmp_constructs(source_code)
-    print("\n🔍 Detected OpenMP constructs:")
-    if any(constructs.values()):
-        print(json.dumps(constructs, indent=2))
+    # Extract constructs; per-construct details are only needed for the listing
+    if quiet:
+        constructs = generator.count_openmp_constructs(source_code)
     else:
-        print("   No OpenMP constructs found")
+        constructs = generator.extract_openmp_constructs(source_code)
+        print("\n🔍 Detected OpenMP constructs:")
+        if any(constructs.values()):
+            print(_dumps_constructs(constructs))
+        else:
+            print("   No OpenMP constructs found")
     
     # Generate CFG
     print("\n🤖 Generating CFG...")
-    prompt = generator.generate_cfg_prompt(source_code, hardware_specs)
     cfg_dot = generator.simulate_llm_response(source_code, constructs)
     
     # Validate
-    print("\n✅ Validating CFG...")
     validation = generator.validate_cfg(cfg_dot, source_code)
-    all_passed = True
-    for check, passed in validation.items():
-        status = "✓ PASS" if passed else "✗ FAIL"
-        print(f"   {check}: {status}")
-        if not passed:
-            all_passed = False
-    
-    if not all_passed:
-        print("\n⚠️  Some validation checks failed, but continuing...")
+    if not quiet:
+        print("\n✅ Validating CFG...")
+        print('\n'.join(f"   {check}: {'✓ PASS' if passed else '✗ FAIL'}"
+                        for check, passed in validation.items()))
+        if not all(validation.values()):
+            print("\n⚠️  Some validation checks failed, but continuing...")
     
     # Save results
-    benchmark_name = Path(args.input).stem
+    benchmark_name = Path(input_path).stem
     print(f"\n💾 Saving results...")
-    dot_file = generator.save_cfg(cfg_dot, args.output, benchmark_name)
+    dot_file = generator.save_cfg(cfg_dot, output_path, benchmark_name, png_backend)
     
     print(f"\n🎉 CFG generated successfully!")
     print(f"📄 DOT file: {dot_file}")
-    print(f"📁 Output directory: {args.output}")
+    print(f"📁 Output directory: {output_path}")
     
     return 0
 
+# One generator per worker process, created by init_worker
+_worker_generator = None
+
+def pool_context():
+    """Multiprocessing context for worker pools: fork on Linux, so workers
+    inherit the already-compiled regexes and DOT templates instead of
+    re-importing this module"""
+    if sys.platform.startswith('linux'):
+        return multiprocessing.get_context('fork')
+    return None
+
+def init_worker():
+    """Pool initializer: create the generator shared by every file a worker
+    processes"""
+    global _worker_generator
+    _worker_generator = OpenMPCFGGenerator()
+
+def process_one(task) -> tuple:
+    """Pool entry point: generate the CFG for one file, writing only its DOT
+    file, and return (exit code, console output, error)
+
+    ``task`` is (input_path, output_path, cores, arch, quiet, output_mode).
+    With ``output_mode='capture'`` the file's console output is returned so
+    the parent can print it in one block; with ``'discard'`` it is dropped.
+    ``error`` is the message of an unexpected exception, otherwise None.
+    """
+    input_path, output_path, cores, arch, quiet, output_mode = task
+    capture = output_mode == 'capture'
+    error = None
+    with (io.StringIO() if capture else open(os.devnull, 'w')) as sink:
+        with redirect_stdout(sink):
+            try:
+                code = process_file(input_path, output_path, cores, arch,
+                                    generator=_worker_generator, png_backend='none',
+                                    quiet=quiet)
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                code, error = 1, str(e)
+        output = sink.getvalue() if capture else ''
+    return code, output, error
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate CFG from OpenMP code (HPC Version)')
+    parser.add_argument('--input', '-i', nargs='+', default=[], help='Input C file path(s)')
+    parser.add_argument('--input-glob', help="Glob of input C files, e.g. '../bots/**/*.c'")
+    parser.add_argument('--output', '-o', default='../output', help='Output directory')
+    parser.add_argument('--cores', type=int, default=8, help='Number of cores')
+    parser.add_argument('--arch', default='x86_64', help='Target architecture')
+    parser.add_argument('--api-key', help='OpenAI API key (optional)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for multiple inputs (default: all CPUs)')
+    parser.add_argument('--quiet', '-q', action='store_true',
+                        help='Skip the construct listing and validation results')
+    parser.add_argument('--png-backend', choices=PNG_BACKENDS, default='auto',
+                        help='PNG renderer; auto tries each in turn, none writes only DOT')
+    
+    args = parser.parse_args()
+    
+    inputs = list(args.input)
+    if args.input_glob:
+        inputs.extend(sorted(glob.glob(args.input_glob, recursive=True)))
+    if not inputs:
+        parser.error('one of --input or --input-glob is required')
+    
+    # Files sharing a stem write the same output files; processed in
+    # parallel they would overwrite each other, so keep only the last one,
+    # which is what processing them in order leaves behind
+    last_index = {Path(input_path).stem: i for i, input_path in enumerate(inputs)}
+    kept = []
+    for i, input_path in enumerate(inputs):
+        last = last_index[Path(input_path).stem]
+        if last == i:
+            kept.append(input_path)
+        else:
+            print(f"⚠️  Skipping {input_path}: {inputs[last]} writes the same output files")
+    skipped = len(inputs) - len(kept)
+    inputs = kept
+    
+    if len(inputs) == 1:
+        return process_file(inputs[0], args.output, args.cores, args.arch, args.api_key,
+                            png_backend=args.png_backend, quiet=args.quiet)
+    
+    # Batch mode: files are independent, so spread them over worker
+    # processes; each worker reuses one generator, and its console output
+    # is printed as a block so files do not interleave. Workers only write
+    # DOT files, and the PNGs are rendered together afterwards
+    tasks = [(input_path, args.output, args.cores, args.arch, args.quiet, 'capture')
+             for input_path in inputs]
+    failed = 0
+    # DOT file -> benchmark name, for every file that was generated
+    dot_files = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(inputs))),
+                             mp_context=pool_context(), initializer=init_worker) as executor:
+        futures = [executor.submit(process_one, task) for task in tasks]
+        for input_path, future in zip(inputs, futures):
+            print(f"\n📂 {input_path}")
+            try:
+                code, output, _ = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for exceeding its memory limit);
+                # every file the pool still had in flight counts as failed
+                code, output = 1, "❌ Error: worker process terminated abruptly\n"
+            print(output, end='')
+            if code:
+                failed += 1
+            else:
+                benchmark_name = Path(input_path).stem
+                dot_files[os.path.join(args.output, f"{benchmark_name}_cfg") + ".dot"] = benchmark_name
+    
+    render_all(dot_files, args.output, args.png_backend)
+    
+    print(f"\n📊 Processed {len(inputs) - failed}/{len(inputs)} files")
+    if skipped:
+        print(f"   ⏭️  Skipped {skipped} files with duplicate names")
+    return 1 if failed else 0
+
 if __name__ == "__main__":
     exit(main())